@@ -1,143 +1,89 @@
 import streamlit as st
 import math
-import pandas as pd
+import numpy as np
 import altair as alt
 
-# --- КОНСТАНТЫ И ИНЖЕНЕРНЫЕ ДАННЫЕ ---
-
-# Коэффициенты теплопроводности материалов, Вт/(м·К)
-MATERIALS = {
-    "Кирпич": 0.81,
-    "Газоблок": 0.12,
-    "Дерево (брус)": 0.18,
-    "Сэндвич-панель": 0.04,
-    "Минеральная вата": 0.045, # Усредненное значение для базальтовой ваты
-    "OSB": 0.13,
-    "Профнастил (сталь)": 58.0 # Высокая, но его толщина мала
-}
-
-# Тепловое сопротивление поверхностей (для более точного расчета)
-R_SI = 0.13  # Внутренняя поверхность, (м²·К)/Вт
-R_SE = 0.04  # Внешняя поверхность, (м²·К)/Вт
-
-# Модели печей "Муссон" с обновленными параметрами
-MUSSON_MODELS = {
-    "Муссон 300":  {"volume_l": 77,  "duct_count": 2, "duct_diameter_mm": 133},
-    "Муссон 600":  {"volume_l": 125, "duct_count": 3, "duct_diameter_mm": 133},
-    "Муссон 1000": {"volume_l": 200, "duct_count": 3, "duct_diameter_mm": 133},
-    "Муссон 1500": {"volume_l": 311, "duct_count": 4, "duct_diameter_mm": 133},
-    "Муссон 2000": {"volume_l": 467, "duct_count": 4, "duct_diameter_mm": 159},
-}
-
-# Плотность и низшая теплотворная способность древесины
-WOOD_TYPES = {
-    "Хвойные (сосна, ель)": {"density": 350, "q_mj_kg": 17.0},
-    "Берёза":               {"density": 450, "q_mj_kg": 18.0},
-    "Дуб":                  {"density": 550, "q_mj_kg": 19.5},
-}
+from musson_core import (
+    BURN_HOURS_OPTIONS, INV_FLOOR_CEILING_R, TIME_GRIDS,
+    average_power_kw, calculate_wall_r_value, heat_loss_core, power_curve_core
+)
 
+# --- КОНСТАНТЫ И ИНЖЕНЕРНЫЕ ДАННЫЕ ---
 
-# --- ИНЖЕНЕРНЫЕ РАСЧЕТЫ ---
+# Модели печей "Муссон" с обновленными параметрами.
+# Хранятся параллельными массивами: i-й элемент каждого массива относится к i-й модели.
+MODEL_NAMES = np.array(["Муссон 300", "Муссон 600", "Муссон 1000", "Муссон 1500", "Муссон 2000"])
+MODEL_VOL_L = np.array([77, 125, 200, 311, 467], dtype=float)  # Объем топки, л
 
-def calculate_wall_r_value(material_type, wall_thickness_m, min_wool_thickness_m=0.05):
-    """
-    Рассчитывает полное термическое сопротивление стены (R-value).
-    Учитывает многослойную конструкцию для минеральной ваты.
-    """
-    if material_type == "Минеральная вата с обшивкой":
-        # R = R_osb + R_wool + R_steel
-        r_osb = 0.009 / MATERIALS["OSB"]
-        r_wool = min_wool_thickness_m / MATERIALS["Минеральная вата"]
-        r_steel = 0.0005 / MATERIALS["Профнастил (сталь)"] # Толщина профнастила ~0.5 мм
-        r_layers = r_osb + r_wool + r_steel
-    else:
-        lambda_wall = MATERIALS.get(material_type, 0.81)
-        r_layers = wall_thickness_m / lambda_wall
+# Плотность и низшая теплотворная способность древесины (параллельные массивы)
+WOOD_NAMES = np.array(["Хвойные (сосна, ель)", "Берёза", "Дуб"])
+WOOD_DENSITY = np.array([350, 450, 550], dtype=float)  # кг/м³
+WOOD_Q = np.array([17.0, 18.0, 19.5])  # МДж/кг
+WOOD_INDEX = {str(name): i for i, name in enumerate(WOOD_NAMES)}
 
-    # Добавляем сопротивление поверхностей для более точного расчета
-    return R_SI + r_layers + R_SE
 
+# --- ИНЖЕНЕРНЫЕ РАСЧЕТЫ ---
 
-def calculate_heat_loss(area, height, wall_r_value, floor_r_value, ceiling_r_value, t_in, t_out):
+@st.cache_data(max_entries=128, show_spinner=False)
+def calculate_heat_loss(area, height, wall_r_value, inv_floor_ceiling_r, t_in, t_out):
     """
     Рассчитывает общие теплопотери помещения через стены, пол и потолок.
+    inv_floor_ceiling_r — сумма 1/R пола и потолка, Вт/(м²·К).
     """
-    delta_t = t_in - t_out
-    if delta_t <= 0:
-        return 0
-
-    # Расчет площадей
-    perimeter = 2 * (math.sqrt(area) + math.sqrt(area)) # Принимаем помещение квадратным для простоты
-    wall_area = perimeter * height
-    floor_area = area
-    ceiling_area = area
-
-    # Теплопотери через каждую конструкцию, Вт
-    q_walls = wall_area * delta_t / wall_r_value
-    q_floor = floor_area * delta_t / floor_r_value
-    q_ceiling = ceiling_area * delta_t / ceiling_r_value
-
-    total_q_w = q_walls + q_floor + q_ceiling
-    return total_q_w / 1000  # Переводим в кВт
+    return heat_loss_core(
+        float(area), float(height), float(wall_r_value),
+        float(inv_floor_ceiling_r), float(t_in - t_out)
+    )
 
 
-def get_furnace_power_curve(volume_l, fill_fraction, wood_type, efficiency, burn_hours):
+@st.cache_data(max_entries=128, show_spinner=False)
+def get_furnace_power_curve(volume_l, fill_fraction, density, q_mj_kg, efficiency, burn_hours):
     """
     Рассчитывает кривую падения мощности печи во времени.
     Моделирует пиковую мощность в начале и плавное затухание.
+    Результат кэшируется: при перерисовке страницы с теми же параметрами
+    кривая не пересчитывается.
     """
-    vol_m3 = volume_l / 1000
-    filled_vol_m3 = vol_m3 * fill_fraction
-    m_wood = filled_vol_m3 * WOOD_TYPES[wood_type]["density"]
-    q_fuel_mj = m_wood * WOOD_TYPES[wood_type]["q_mj_kg"]
-    
-    total_kwh = (q_fuel_mj / 3.6) * efficiency
-
-    # Моделируем пиковую мощность в 2 раза выше средней для более реалистичной кривой
-    # Интеграл мощности по времени равен общей энергии
-    # Для линейно убывающей мощности P_peak = 2 * P_avg
-    avg_power_kw = total_kwh / burn_hours if burn_hours > 0 else 0
-    peak_power_kw = avg_power_kw * 2
-
-    time_points = [i * 0.5 for i in range(int(burn_hours * 2) + 1)]
-    power_points = []
-    for t in time_points:
-        # Линейная интерполяция от пика до нуля
-        power = peak_power_kw * (1 - t / burn_hours)
-        power_points.append(max(0, power))
-
+    time_points = TIME_GRIDS[burn_hours]
+    power_points, total_kwh = power_curve_core(
+        time_points, float(volume_l), float(fill_fraction), float(density),
+        float(q_mj_kg), float(efficiency), float(burn_hours)
+    )
     return time_points, power_points, total_kwh
 
 
+@st.cache_data(max_entries=128, show_spinner=False)
 def generate_report(params, heat_loss_kw, recommended_model, cascade_option, refuel_time):
-    """Генерирует текстовый отчет для скачивания."""
+    """Генерирует текстовый отчет для скачивания (кэшируется по параметрам)."""
+    (area, height, material, thickness_cm, t_in, t_out,
+     wood_type, fill_fraction, efficiency, burn_hours) = params
     report = f"""
 # Отчет по подбору печи "Муссон"
 
 ## 1. Параметры помещения и климата
-- Площадь помещения: {params['area']} м²
-- Высота потолков: {params['height']} м
-- Объем помещения: {params['area'] * params['height']:.1f} м³
-- Материал стен: {params['material']}
-- Толщина основной стены / утеплителя: {params['thickness_cm']} см
-- Желаемая внутренняя температура: {params['t_in']} °C
-- Наружная температура: {params['t_out']} °C
+- Площадь помещения: {area} м²
+- Высота потолков: {height} м
+- Объем помещения: {area * height:.1f} м³
+- Материал стен: {material}
+- Толщина основной стены / утеплителя: {thickness_cm} см
+- Желаемая внутренняя температура: {t_in} °C
+- Наружная температура: {t_out} °C
 
 ## 2. Расчетные теплопотери
 - **Требуемая мощность для компенсации теплопотерь: {heat_loss_kw:.2f} кВт**
 - С учетом запаса 20%: **{heat_loss_kw * 1.2:.2f} кВт**
 
 ## 3. Параметры топки
-- Порода древесины: {params['wood_type']}
-- Заполнение топки: {params['fill_fraction']*100:.0f}%
-- КПД печи: {params['efficiency']*100:.0f}%
-- Продолжительность горения закладки: {params['burn_hours']} ч
+- Порода древесины: {wood_type}
+- Заполнение топки: {fill_fraction*100:.0f}%
+- КПД печи: {efficiency*100:.0f}%
+- Продолжительность горения закладки: {burn_hours} ч
 
 ## 4. Рекомендации
 """
     if recommended_model:
         report += f"- **Рекомендуемая модель: {recommended_model}**\n"
-        report += f"- **Рекомендация по топке:** Для поддержания стабильной температуры ~{params['t_in']}°C, рекомендуется производить следующую закладку дров **каждые {refuel_time:.1f} ч.**\n"
+        report += f"- **Рекомендация по топке:** Для поддержания стабильной температуры ~{t_in}°C, рекомендуется производить следующую закладку дров **каждые {refuel_time:.1f} ч.**\n"
     else:
         report += "- Ни одна из одиночных моделей не справляется с теплопотерями.\n"
 
@@ -147,6 +93,29 @@ def generate_report(params, heat_loss_kw, recommended_model, cascade_option, ref
     report += "\n---\n*Этот расчет является предварительным. Для точного подбора оборудования рекомендуется консультация со специалистом и проведение детального теплотехнического аудита объекта.*"
     return report
 
+# --- ГРАФИКИ ---
+
+@st.cache_resource
+def _build_power_chart_template():
+    """
+    Строит шаблон графика мощности печи без данных.
+    Шаблон создается один раз; данные и заголовок задаются через .properties().
+    """
+    return alt.Chart().mark_area(
+        line={'color':'darkgreen'},
+        color=alt.Gradient(
+            gradient='linear',
+            stops=[alt.GradientStop(color='white', offset=0), alt.GradientStop(color='darkgreen', offset=1)],
+            x1=1, x2=1, y1=1, y2=0
+        ),
+        interpolate='monotone',
+        opacity=0.7
+    ).encode(
+        x=alt.X('Время (часы):Q', axis=alt.Axis(title='Время с момента закладки, ч')),
+        y=alt.Y('Мощность печи (кВт):Q', axis=alt.Axis(title='Тепловая мощность, кВт'))
+    )
+
+
 # --- ИНТЕРФЕЙС STREAMLIT ---
 
 st.set_page_config(layout="wide")
@@ -175,10 +144,15 @@ t_in = st.sidebar.slider("Желаемая внутренняя температ
 t_out = st.sidebar.slider("Наружная температура зимой (°C)", -50, 10, -20)
 
 st.sidebar.header("3. Параметры топки")
-wood_type = st.sidebar.selectbox("Порода древесины", list(WOOD_TYPES.keys()))
+wood_type = st.sidebar.selectbox("Порода древесины", WOOD_NAMES.tolist())
 fill_fraction = st.sidebar.slider("Процент заполнения топки", 50, 100, 80) / 100
 efficiency = st.sidebar.slider("КПД печи и системы (%)", 70, 95, 85) / 100
-burn_hours = st.sidebar.selectbox("Время горения одной закладки (ч)", [2, 4, 6, 8, 12, 18, 24], index=3)
+burn_hours = st.sidebar.selectbox("Время горения одной закладки (ч)", BURN_HOURS_OPTIONS, index=3)
+
+# Без разницы температур теплопотерь нет — подбирать печь и строить график незачем
+if t_in <= t_out:
+    st.warning("Внутренняя температура не выше наружной — отопление не требуется.")
+    st.stop()
 
 
 # --- Выполнение расчетов ---
@@ -186,11 +160,7 @@ wall_thickness_m = thickness_cm / 100
 min_wool_thickness_m = thickness_cm / 100 if material_type == "Минеральная вата с обшивкой" else 0.05
 
 wall_r_val = calculate_wall_r_value(material_type, wall_thickness_m, min_wool_thickness_m)
-# Упрощенные, но разумные R-value для пола и потолка. Можно сделать их настраиваемыми.
-floor_r_val = 2.5 # Утепленный пол по грунту
-ceiling_r_val = 3.5 # Утепленное чердачное перекрытие
-
-heat_loss_kw = calculate_heat_loss(area, height, wall_r_val, floor_r_val, ceiling_r_val, t_in, t_out)
+heat_loss_kw = calculate_heat_loss(area, height, wall_r_val, INV_FLOOR_CEILING_R, t_in, t_out)
 required_power_with_margin = heat_loss_kw * 1.2 # Запас 20%
 
 # --- Отображение результатов ---
@@ -202,25 +172,20 @@ with col1:
     st.metric(label="Мощность с запасом 20%", value=f"{required_power_with_margin:.2f} кВт")
     st.info("Это мощность, которую система отопления должна постоянно поставлять для поддержания заданной температуры.")
 
-all_models_data = []
+# Средняя мощность всех моделей одним векторным выражением
+wood_idx = WOOD_INDEX[wood_type]
+wood_density = float(WOOD_DENSITY[wood_idx])
+wood_q_mj_kg = float(WOOD_Q[wood_idx])
+avg_powers = average_power_kw(MODEL_VOL_L, fill_fraction, wood_density, wood_q_mj_kg, efficiency, float(burn_hours))
+
+# Логика выбора лучшей модели
 recommended_model = None
 best_model_avg_power = 0
-
-for model_name, params in MUSSON_MODELS.items():
-    time_pts, power_pts, total_kwh = get_furnace_power_curve(params["volume_l"], fill_fraction, wood_type, efficiency, burn_hours)
-    avg_power = total_kwh / burn_hours if burn_hours > 0 else 0
-    
-    all_models_data.append({
-        "model": model_name,
-        "time": time_pts,
-        "power": power_pts,
-        "avg_power": avg_power
-    })
-    
-    # Логика выбора лучшей модели
-    if avg_power >= required_power_with_margin and avg_power > best_model_avg_power:
-        recommended_model = model_name
-        best_model_avg_power = avg_power
+suitable = avg_powers >= required_power_with_margin
+if suitable.any():
+    recommended_idx = int(np.where(suitable, avg_powers, -np.inf).argmax())
+    recommended_model = str(MODEL_NAMES[recommended_idx])
+    best_model_avg_power = float(avg_powers[recommended_idx])
 
 with col2:
     st.subheader("Рекомендации")
@@ -235,57 +200,49 @@ with col2:
     cascade_option = None
     if not recommended_model and heat_loss_kw > 0:
         # Попробуем найти каскад из самой мощной модели
-        most_powerful = max(all_models_data, key=lambda x: x['avg_power'])
-        if most_powerful['avg_power'] > 0:
-            num_furnaces = math.ceil(required_power_with_margin / most_powerful['avg_power'])
+        best_idx = int(np.argmax(avg_powers))
+        most_powerful_name = str(MODEL_NAMES[best_idx])
+        most_powerful_power = float(avg_powers[best_idx])
+        if most_powerful_power > 0:
+            num_furnaces = math.ceil(required_power_with_margin / most_powerful_power)
             if num_furnaces > 1:
-                cascade_option = f"{num_furnaces} шт. x {most_powerful['model']}"
+                cascade_option = f"{num_furnaces} шт. x {most_powerful_name}"
                 st.warning(f"**Каскадное решение:** Для покрытия теплопотерь можно установить **{cascade_option}**.")
 
 
 st.header("График эффективности горения")
 
 if recommended_model:
-    rec_model_data = next(item for item in all_models_data if item["model"] == recommended_model)
-    
-    # Находим время для следующей закладки
-    refuel_time = 0
-    for t, p in zip(rec_model_data['time'], rec_model_data['power']):
-        if p >= required_power_with_margin:
-            refuel_time = t
-        else:
-            break
-            
+    # Кривую мощности строим только для рекомендованной модели
+    rec_time, rec_power, _ = get_furnace_power_curve(
+        float(MODEL_VOL_L[recommended_idx]), fill_fraction, wood_density, wood_q_mj_kg, efficiency, burn_hours
+    )
+
+    # Находим время для следующей закладки: мощность падает линейно от пика
+    # до нуля, поэтому момент пересечения с требуемой мощностью считается напрямую.
+    # Пик берем из уже построенной кривой, чтобы расчет и график не расходились
+    peak_power_kw = float(rec_power[0])
+    refuel_time = max(0.0, burn_hours * (1.0 - required_power_with_margin / peak_power_kw))
+
     with col2:
          st.subheader("Периодичность топки")
          st.info(f"Для поддержания температуры, вам необходимо будет подкладывать дрова примерно **каждые {refuel_time:.1f} часа**.")
 
 
-    # Создание датафрейма для графика
-    source = pd.DataFrame({
-        'Время (часы)': rec_model_data['time'],
-        'Мощность печи (кВт)': rec_model_data['power']
-    })
+    # Данные для графика: два небольших массива передаются в Altair напрямую, без DataFrame
+    source = alt.Data(values=[
+        {'Время (часы)': t, 'Мощность печи (кВт)': p}
+        for t, p in zip(rec_time.tolist(), rec_power.tolist())
+    ])
 
-    # График мощности печи
-    power_chart = alt.Chart(source).mark_area(
-        line={'color':'darkgreen'},
-        color=alt.Gradient(
-            gradient='linear',
-            stops=[alt.GradientStop(color='white', offset=0), alt.GradientStop(color='darkgreen', offset=1)],
-            x1=1, x2=1, y1=1, y2=0
-        ),
-        interpolate='monotone',
-        opacity=0.7
-    ).encode(
-        x=alt.X('Время (часы):Q', axis=alt.Axis(title='Время с момента закладки, ч')),
-        y=alt.Y('Мощность печи (кВт):Q', axis=alt.Axis(title='Тепловая мощность, кВт'))
-    ).properties(
+    # График мощности печи: шаблон берется из кэша, подставляются только данные
+    power_chart = _build_power_chart_template().properties(
+        data=source,
         title=f'Снижение мощности печи "{recommended_model}"'
     )
     
     # Линия теплопотерь
-    heat_loss_line = alt.Chart(pd.DataFrame({'y': [required_power_with_margin]})).mark_rule(color='red', strokeDash=[5,5], size=2).encode(y='y')
+    heat_loss_line = alt.Chart(alt.Data(values=[{'y': required_power_with_margin}])).mark_rule(color='red', strokeDash=[5,5], size=2).encode(y='y:Q')
     
     heat_loss_text = heat_loss_line.mark_text(
         align='left',
@@ -310,12 +267,12 @@ else:
 
 # --- Генерация отчета ---
 st.header("Скачать полный отчет")
-report_params = {
-    'area': area, 'height': height, 'material': material_type,
-    'thickness_cm': thickness_cm, 't_in': t_in, 't_out': t_out,
-    'wood_type': wood_type, 'fill_fraction': fill_fraction,
-    'efficiency': efficiency, 'burn_hours': burn_hours
-}
+report_params = (
+    area, height, material_type,
+    thickness_cm, t_in, t_out,
+    wood_type, fill_fraction,
+    efficiency, burn_hours
+)
 final_report = generate_report(report_params, heat_loss_kw, recommended_model, cascade_option, refuel_time if recommended_model else 0)
 
 st.download_button(
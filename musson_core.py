@@ -0,0 +1,121 @@
+"""
+Скомпилированные (Numba) ядра инженерных расчетов калькулятора, а также
+справочные константы и таблицы, которые достаточно построить один раз за процесс:
+свойства материалов, R-value пола и потолка, допустимое время горения закладки
+(используется и как варианты выбора в интерфейсе) и сетки времени для графика.
+
+Вынесены из app.py в отдельный модуль: Streamlit при каждой перерисовке
+заново исполняет основной скрипт, а импортированный модуль загружается
+один раз за процесс, поэтому JIT-функции компилируются, а константы и таблицы
+вычисляются только один раз. Кэшированные функции app.py получают такие
+значения аргументами, чтобы они входили в ключ кэша.
+"""
+import math
+from functools import lru_cache
+
+import numba
+import numpy as np
+
+# Коэффициенты теплопроводности материалов, Вт/(м·К)
+MATERIALS = {
+    "Кирпич": 0.81,
+    "Газоблок": 0.12,
+    "Дерево (брус)": 0.18,
+    "Сэндвич-панель": 0.04,
+    "Минеральная вата": 0.045, # Усредненное значение для базальтовой ваты
+    "OSB": 0.13,
+    "Профнастил (сталь)": 58.0 # Высокая, но его толщина мала
+}
+
+# Тепловое сопротивление поверхностей (для более точного расчета)
+R_SI = 0.13  # Внутренняя поверхность, (м²·К)/Вт
+R_SE = 0.04  # Внешняя поверхность, (м²·К)/Вт
+
+# Обратные коэффициенты теплопроводности, (м·К)/Вт
+INV_LAMBDA = {k: 1.0 / v for k, v in MATERIALS.items()}
+
+# Постоянная часть сопротивления стены из минваты с обшивкой:
+# OSB 9 мм + профнастил ~0.5 мм + сопротивление поверхностей
+R_MIN_WOOL_CONST = 0.009 / MATERIALS["OSB"] + 0.0005 / MATERIALS["Профнастил (сталь)"] + R_SI + R_SE
+
+# Упрощенные, но разумные R-value для пола и потолка, (м²·К)/Вт. Можно сделать их настраиваемыми.
+FLOOR_R_VALUE = 2.5  # Утепленный пол по грунту
+CEILING_R_VALUE = 3.5  # Утепленное чердачное перекрытие
+
+# Суммарная теплопроводность пола и потолка на 1 м² площади помещения, Вт/(м²·К)
+INV_FLOOR_CEILING_R = 1.0 / FLOOR_R_VALUE + 1.0 / CEILING_R_VALUE
+
+# Допустимое время горения одной закладки, ч (варианты выбора в интерфейсе)
+BURN_HOURS_OPTIONS = (2, 4, 6, 8, 12, 18, 24)
+
+
+def _build_time_grid(burn_hours):
+    """Сетка времени с шагом 0.5 ч, защищенная от записи: массив общий для всего процесса."""
+    grid = np.arange(0, burn_hours + 0.5, 0.5)
+    grid.setflags(write=False)
+    return grid
+
+
+# Заранее построенные сетки времени для графика мощности
+TIME_GRIDS = {h: _build_time_grid(h) for h in BURN_HOURS_OPTIONS}
+
+
+@lru_cache(maxsize=64)
+def calculate_wall_r_value(material_type, wall_thickness_m, min_wool_thickness_m=0.05):
+    """
+    Рассчитывает полное термическое сопротивление стены (R-value).
+    Учитывает многослойную конструкцию для минеральной ваты.
+    Кэш живет в этом модуле вместе с константами, от которых зависит результат.
+    """
+    if material_type == "Минеральная вата с обшивкой":
+        # R = R_osb + R_wool + R_steel + поверхности
+        return R_MIN_WOOL_CONST + min_wool_thickness_m * INV_LAMBDA["Минеральная вата"]
+
+    # Добавляем сопротивление поверхностей для более точного расчета
+    return R_SI + wall_thickness_m * INV_LAMBDA.get(material_type, INV_LAMBDA["Кирпич"]) + R_SE
+
+
+@numba.njit(cache=True)
+def heat_loss_core(area, height, wall_r_value, inv_floor_ceiling_r, delta_t):
+    """Скомпилированное ядро расчета теплопотерь, кВт."""
+    if delta_t <= 0:
+        return 0.0
+
+    perimeter = 4.0 * math.sqrt(area) # Принимаем помещение квадратным для простоты
+
+    # Теплопотери на 1 К разницы температур, Вт/К: пол и потолок + стены
+    q_per_delta = area * inv_floor_ceiling_r + perimeter * height / wall_r_value
+
+    return delta_t * q_per_delta * 0.001  # Переводим в кВт
+
+
+@numba.njit(cache=True)
+def average_power_kw(volume_l, fill_fraction, density, q_mj_kg, efficiency, burn_hours):
+    """
+    Средняя мощность печи за время горения одной закладки, кВт.
+    volume_l может быть числом или массивом объемов топок всех моделей.
+    """
+    vol_m3 = volume_l / 1000
+    filled_vol_m3 = vol_m3 * fill_fraction
+    m_wood = filled_vol_m3 * density
+    q_fuel_mj = m_wood * q_mj_kg
+
+    total_kwh = (q_fuel_mj / 3.6) * efficiency
+    return total_kwh / burn_hours
+
+
+@numba.njit(cache=True)
+def power_curve_core(time_points, volume_l, fill_fraction, density, q_mj_kg, efficiency, burn_hours):
+    """Скомпилированное ядро расчета кривой мощности печи."""
+    avg_power_kw = average_power_kw(volume_l, fill_fraction, density, q_mj_kg, efficiency, burn_hours)
+    total_kwh = avg_power_kw * burn_hours
+
+    # Моделируем пиковую мощность в 2 раза выше средней для более реалистичной кривой
+    # Интеграл мощности по времени равен общей энергии
+    # Для линейно убывающей мощности P_peak = 2 * P_avg
+    peak_power_kw = avg_power_kw * 2
+
+    # Линейная интерполяция от пика до нуля
+    power_points = np.maximum(peak_power_kw * (1.0 - time_points / burn_hours), 0.0)
+
+    return power_points, total_kwh